@@ -15,6 +15,7 @@ from datetime import date
 from eodal.core.raster import RasterCollection
 from matplotlib.axes import Axes
 from matplotlib_scalebar.scalebar import ScaleBar
+from numba import njit
 from numbers import Number
 from pathlib import Path
 from scipy.stats import linregress
@@ -28,6 +29,22 @@ tillering = [x for x in range(0, 30)]  # horizontal growth
 stem_elong = [x for x in range(31, 60)]  # vertical growth (until anthesis)
 reproductive = [x for x in range(61, 100)]  # flowering, ripening, senescence
 
+# breakpoints and labels for the vectorized assignment of macro-stages.
+# `_classify_bbch` assigns each BBCH code the number of breakpoints it is
+# greater than or equal to, i.e., the bins are left-closed ([0, 30),
+# [30, 31), [31, 60), ...) and codes below the first breakpoint get index 0.
+# The labels therefore have one element more than the breakpoints
+BBCH_BINS = np.array([0, 30, 31, 60, 61, 100], dtype='float64')
+MACRO_LABELS = np.array([
+    'invalid',
+    'germination - end of tillering',
+    'invalid',
+    'stem elongation - end of heading',
+    'invalid',
+    'flowering - fruit development - plant dead',
+    'invalid'
+], dtype=object)
+
 # base temperature of winter wheat [deg C]
 TBASE = 0
 
@@ -80,6 +97,50 @@ def assign_macro_stages(bbch_val: int) -> str:
         return 'invalid'
 
 
+@njit(cache=True)
+def _classify_bbch(
+        bbch_vals: np.ndarray,
+        bins: np.ndarray,
+        out: np.ndarray
+) -> None:
+    """
+    Assigns the index of the macro-stage label to BBCH ratings.
+
+    :param bbch_vals:
+        BBCH ratings as float array
+    :param bins:
+        breakpoints of the macro-stages
+    :param out:
+        integer array of the same size as `bbch_vals` to which the
+        indices of the macro-stage labels are written
+    """
+    for i in range(bbch_vals.size):
+        bbch_val = bbch_vals[i]
+        # non-integer and NaN ratings are invalid
+        if bbch_val != np.floor(bbch_val):
+            out[i] = 0
+            continue
+        idx = 0
+        while idx < bins.size and bbch_val >= bins[idx]:
+            idx += 1
+        out[i] = idx
+
+
+def assign_macro_stages_vec(bbch_vals: np.ndarray | pd.Series) -> np.ndarray:
+    """
+    Vectorized version of `assign_macro_stages`.
+
+    :param bbch_vals:
+        BBCH ratings. Non-integer and NaN ratings are labeled as 'invalid'
+    :returns:
+        array with macro-stage labels
+    """
+    vals = np.ascontiguousarray(bbch_vals, dtype='float64')
+    label_idxs = np.empty(vals.shape, dtype='int8')
+    _classify_bbch(vals.ravel(), BBCH_BINS, label_idxs.ravel())
+    return MACRO_LABELS[label_idxs]
+
+
 def from_agrometeo(fpath: Path) -> pd.DataFrame:
     df = pd.read_csv(fpath, sep=',')
     df['date'] = pd.to_datetime(df['Datum'], format='%d.%m.%Y')
@@ -352,11 +413,12 @@ def bbch_confusion_matrix(df: pd.DataFrame, out_dir: Path) -> None:
     phenological macro-stages. The confusion matrix and f1-scores
     are saved to disk as csv files.
     """
-    df['BBCH Rating (Macro-Stages)'] = df['BBCH Rating'].apply(
-        lambda x, assign_macro_stages=assign_macro_stages:
-            assign_macro_stages(bbch_val=x)
-    )
-    df = df[df['BBCH Rating (Macro-Stages)'] != 'invalid'].copy()
+    # the macro-stages are assigned to the filtered copy only so that the
+    # DataFrame passed is not modified
+    bbch_macro_stages = assign_macro_stages_vec(df['BBCH Rating'])
+    valid = bbch_macro_stages != 'invalid'
+    df = df[valid].copy()
+    df['BBCH Rating (Macro-Stages)'] = bbch_macro_stages[valid]
     # reindex dataframe to avoid errors in crosstab
     df.index = [x for x in range(df.shape[0])]
     true_stages = df['BBCH Rating (Macro-Stages)'].copy()
@@ -6,14 +6,21 @@ calculating common error metrics and plotting scatter.
 '''
 
 import geopandas as gpd
+import hashlib
 import matplotlib as mpl
-import matplotlib.pyplot as plt
-import pandas as pd
-
-from pathlib import Path
-
-from utils import (
-    assign_macro_stages,
+# non-interactive backend, figures are only saved to file. Must be
+# selected before pyplot is imported (also indirectly through utils)
+mpl.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from concurrent.futures import ProcessPoolExecutor  # noqa: E402
+from matplotlib.backends.backend_pdf import PdfPages  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Any, Dict, List  # noqa: E402
+
+from utils import (  # noqa: E402
     bbch_confusion_matrix,
     join_with_insitu,
     plot_prediction,
@@ -23,6 +30,85 @@ from utils import (
 mpl.rc('font', size=16)
 plt.style.use('bmh')
 
+# number of points above which scatter plots are rasterized
+RASTERIZE_THRESHOLD = 5000
+# resolution of the saved figures [dots per inch]
+FIGURE_DPI = 150
+# the point id of the 2019 plots consists of the first two '_'-separated
+# parts of the plot name
+PLOT_TO_POINT_ID = r'^([^_]*(?:_[^_]*)?)'
+# attribute columns read from the in-situ GeoPackages (per year). The
+# geometries are not required for the validation and are not read, the
+# GeoPackages are therefore returned as plain DataFrames
+INSITU_COLS_2019 = ['Plot', 'field', 'date']
+INSITU_COLS_2022 = [
+    'point_id', 'gdd_cumsum', 'parcel', 'genotype', 'location', 'date'
+]
+INSITU_COLS = {
+    2019: {
+        'lai': INSITU_COLS_2019 + ['lai'],
+        'ccc': INSITU_COLS_2019 + ['CCC [g/m2]']
+    },
+    2022: {
+        'lai': INSITU_COLS_2022 + ['lai'],
+        'ccc': INSITU_COLS_2022 + ['ccc']
+    }
+}
+BBCH_COLS = ['point_id', 'gdd_cumsum', 'parcel', 'location', 'BBCH Rating']
+# columns of the inversion results required to join the in-situ data and
+# kept in the joined data for the figure scripts (e.g., scene_id)
+INV_RES_KEY_COLS = [
+    'location', 'parcel', 'point_id', 'gdd_cumsum', 'date', 'Macro-Stage',
+    'scene_id'
+]
+
+
+def _rasterize_scatter(ax: plt.Axes, n_points: int) -> None:
+    """
+    Rasterize the scatter point collections of an axis if the number of
+    points exceeds `RASTERIZE_THRESHOLD`. Axes, labels and text remain
+    vector graphics.
+
+    :param ax:
+        axis with scatter plot
+    :param n_points:
+        number of points plotted
+    """
+    if n_points <= RASTERIZE_THRESHOLD:
+        return
+    for collection in ax.collections:
+        collection.set_rasterized(True)
+
+
+def read_inv_res(fpath_inv_res: Path, traits: List[str]) -> pd.DataFrame:
+    """
+    Read only those columns of the inversion results required for
+    validating the traits. Trait columns are read as float32.
+
+    :param fpath_inv_res:
+        path to the csv file with inversion results at the in-situ points
+    :param traits:
+        traits to validate. For 'cab', the 'lai' and 'ccc' columns are
+        read instead to derive cab from them.
+    :returns:
+        DataFrame with inversion results
+    """
+    trait_prefixes = set(traits)
+    # cab is derived from lai and ccc (see `derive_cab`)
+    if 'cab' in trait_prefixes:
+        trait_prefixes.remove('cab')
+        trait_prefixes.update(['lai', 'ccc'])
+    trait_prefixes = tuple(trait_prefixes)
+    header = pd.read_csv(fpath_inv_res, nrows=0).columns
+    usecols = [
+        col for col in header
+        if col in INV_RES_KEY_COLS or col.startswith(trait_prefixes)
+    ]
+    dtype = {
+        col: np.float32 for col in usecols if col not in INV_RES_KEY_COLS
+    }
+    return pd.read_csv(fpath_inv_res, usecols=usecols, dtype=dtype)
+
 
 def validate_data(
     _df: pd.DataFrame,
@@ -49,17 +135,24 @@ def validate_data(
         limits of the trait for plotting
     """
 
-    df = _df.copy()
-    df.dropna(subset=[trait], inplace=True)
+    # output file paths
+    slug = trait.replace(' ', '-')
+    fpaths = {
+        'report': out_dir.joinpath(f'{slug}_report.pdf'),
+        'error_stats': out_dir.joinpath(f'{slug}_error_stats_combined.csv')
+    }
 
-    f, ax = plt.subplots(figsize=(20, 10), ncols=2)
+    # dropna returns a new frame, so `_df` is not modified
+    df = _df.dropna(subset=[trait])
+    # the predicted traits are already float32 (see `read_inv_res`), the
+    # in-situ reference is cast to the same precision
+    true = df[trait].astype(np.float32)
 
-    df_all = df.copy()
-    df_pheno = df.copy()
+    f_overall, ax = plt.subplots(figsize=(20, 10), ncols=2)
 
     _, error_stats_all = plot_prediction(
-        true=df_all[trait],
-        pred=df_all[f'{trait}_all'],
+        true=true,
+        pred=df[f'{trait}_all'],
         trait_name=trait_name,
         trait_unit=trait_unit,
         trait_lims=trait_limits,
@@ -67,11 +160,13 @@ def validate_data(
         pred_unc=None
     )
     error_stats_all['phenology_considered'] = False
+    error_stats_all['report'] = 'all'
+    _rasterize_scatter(ax[0], n_points=df.shape[0])
     ax[0].set_title('Inversion WITHOUT phenological constraints')
 
     _, error_stats_pheno = plot_prediction(
-        true=df_pheno[trait],
-        pred=df_pheno[f'{trait} (Phenology)'],
+        true=true,
+        pred=df[f'{trait} (Phenology)'],
         trait_name=trait_name,
         trait_unit=trait_unit,
         trait_lims=trait_limits,
@@ -79,84 +174,181 @@ def validate_data(
         pred_unc=None
     )
     error_stats_pheno['phenology_considered'] = True
+    error_stats_pheno['report'] = 'pheno'
+    _rasterize_scatter(ax[1], n_points=df.shape[0])
     ax[1].set_title('Inversion WITH phenological constraints')
-    fname_scatter = out_dir.joinpath(
-        f'{trait.replace(" ","-")}_scatterplot.png')
-    f.savefig(fname_scatter)
-    plt.close(f)
-
-    error_stats = pd.DataFrame([error_stats_all, error_stats_pheno])
-    error_stats.to_csv(
-        out_dir.joinpath(f'{trait.replace(" ","-")}_error_stats.csv'))
-
-    # check retrieval accuracy across phenological macro stages
-    # assign macro-stages to in-situ BBCH ratings
-    df['BBCH Rating (Macro-Stages)'] = df['BBCH Rating'].apply(
-        lambda x, assign_macro_stages=assign_macro_stages:
-            assign_macro_stages(bbch_val=x)
-    )
+    # error statistics of all reports are written to a single file
+    error_stats_list = [error_stats_all, error_stats_pheno]
+
     n_macro_stages = df['Macro-Stage'].nunique()
-    df_stages = df.groupby(by='Macro-Stage')
-    f, ax = plt.subplots(figsize=(10*n_macro_stages, 10), ncols=n_macro_stages)
-    idx = 0
-    err_stats_list = []
-    for macro_stage, df_stage in df_stages:
-        _, err_stats = plot_prediction(
-            true=df_stage[trait],
-            pred=df_stage[f'{trait} (Phenology)'],
-            trait_name=trait_name,
-            trait_unit=trait_unit,
-            trait_lims=trait_limits,
-            ax=ax[idx]
-        )
-        ax[idx].set_title(f'Macro-Stage: {macro_stage}')
-        err_stats['phase'] = macro_stage
-        err_stats_list.append(err_stats)
-        idx += 1
-    fname_scatter_phases = out_dir.joinpath(
-        f'{trait.replace(" ","-")}_scatterplot_pheno_phases.png'
-    )
-    f.savefig(fname_scatter_phases)
-    plt.close(f)
-    err_stats_df = pd.DataFrame(err_stats_list)
-    fname_error_phases = out_dir.joinpath(
-        f'{trait.replace(" ","-")}_errors_pheno_phases.csv'
-    )
-    err_stats_df.to_csv(fname_error_phases, index=False)
-
-    # check performance of the single parametrization across all stages
-    f, ax = plt.subplots(figsize=(10*n_macro_stages, 10), ncols=n_macro_stages)
-    idx = 0
-    err_stats_list = []
-    for macro_stage, df_stage in df_stages:
-        _, err_stats = plot_prediction(
-            true=df_stage[trait],
-            pred=df_stage[f'{trait}_all'],
-            trait_name=trait_name,
-            trait_unit=trait_unit,
-            trait_lims=trait_limits,
-            ax=ax[idx]
-        )
-        ax[idx].set_title(f'Macro-Stage: {macro_stage}')
-        err_stats['phase'] = macro_stage
-        err_stats_list.append(err_stats)
-        idx += 1
-    fname_scatter_phases = out_dir.joinpath(
-        f'{trait.replace(" ","-")}_scatterplot_pheno_phases_all.png'
-    )
-    f.savefig(fname_scatter_phases)
-    plt.close(f)
-    err_stats_df = pd.DataFrame(err_stats_list)
-    fname_error_phases = out_dir.joinpath(
-        f'{trait.replace(" ","-")}_errors_pheno_phases_all.csv'
-    )
-    err_stats_df.to_csv(fname_error_phases, index=False)
+    # only iterate over macro-stages present (in order of appearance).
+    # The column itself is kept as is for the BBCH confusion matrix
+    df_stages = df.groupby(
+        by=df['Macro-Stage'].astype('category'), sort=False, observed=True)
+    # figures for the phenology-aware inversion (f_pheno) and the single
+    # parametrization across all stages (f_all)
+    f_pheno, ax_pheno = plt.subplots(
+        figsize=(10*n_macro_stages, 10), ncols=n_macro_stages)
+    f_all, ax_all = plt.subplots(
+        figsize=(10*n_macro_stages, 10), ncols=n_macro_stages)
+    # check retrieval accuracy across phenological macro stages (pheno)
+    # and performance of the single parametrization across all stages (all)
+    stage_plots = [
+        (f'{trait} (Phenology)', ax_pheno, 'stage_pheno'),
+        (f'{trait}_all', ax_all, 'stage_all')
+    ]
+    for idx, (macro_stage, df_stage) in enumerate(df_stages):
+        for pred_col, ax_stage, report in stage_plots:
+            # skip macro-stages without predictions
+            df_pred = df_stage[[trait, pred_col]].dropna()
+            if df_pred.empty:
+                ax_stage[idx].set_axis_off()
+                continue
+            _, err_stats = plot_prediction(
+                true=df_pred[trait].astype(np.float32),
+                pred=df_pred[pred_col],
+                trait_name=trait_name,
+                trait_unit=trait_unit,
+                trait_lims=trait_limits,
+                ax=ax_stage[idx]
+            )
+            _rasterize_scatter(ax_stage[idx], n_points=df_pred.shape[0])
+            ax_stage[idx].set_title(f'Macro-Stage: {macro_stage}')
+            err_stats['phase'] = macro_stage
+            err_stats['report'] = report
+            error_stats_list.append(err_stats)
+
+    # all scatter plots are written to a single multi-page pdf
+    with PdfPages(fpaths['report']) as pdf:
+        for fig in [f_overall, f_pheno, f_all]:
+            pdf.savefig(fig, dpi=FIGURE_DPI)
+            plt.close(fig)
+    error_stats = pd.DataFrame(error_stats_list)
+    error_stats.to_csv(fpaths['error_stats'], index=False)
 
     # check how the retrieved phenological macro stages compare to
     # in-situ BBCH ratings
     bbch_confusion_matrix(df, out_dir)
 
 
+def derive_cab(inv_res_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Derive leaf chlorophyll content (cab) from the inverted canopy
+    chlorophyll content (ccc) and green leaf area index (lai).
+
+    :param inv_res_df:
+        DataFrame with inversion results containing lai and ccc columns
+    :returns:
+        DataFrame with cab columns added (one per lai column)
+    """
+    # get all columns starting with 'lai' in inv_res_df
+    lai_cols = [
+        col for col in inv_res_df.columns
+        if col.startswith('lai')]
+    ccc_cols = [x.replace('lai', 'ccc') for x in lai_cols]
+    cab_cols = [x.replace('lai', 'cab') for x in lai_cols]
+    # derive all cab columns in a single array operation;
+    # cab is undefined (NaN) where lai equals zero
+    lai_mat = inv_res_df[lai_cols].to_numpy(dtype=np.float32)
+    ccc_mat = inv_res_df[ccc_cols].to_numpy(dtype=np.float32)
+    cab_mat = np.divide(
+        ccc_mat,
+        lai_mat,
+        out=np.full_like(ccc_mat, np.nan),
+        where=lai_mat != 0
+    ) * np.float32(100)  # [ug/cm2]
+    return pd.concat([
+        inv_res_df.drop(columns=cab_cols, errors='ignore'),
+        pd.DataFrame(cab_mat, columns=cab_cols, index=inv_res_df.index)
+    ], axis=1)
+
+
+def input_tag(fpaths: List[Path]) -> str:
+    """
+    Tag identifying the state of input files based on their modification
+    time and size. The tag changes whenever one of the files changes.
+
+    :param fpaths:
+        paths to the input files
+    :returns:
+        hex-digest of 12 characters
+    """
+    file_states = sorted(
+        f'{fpath}|{fpath.stat().st_mtime_ns}|{fpath.stat().st_size}'
+        for fpath in fpaths
+    )
+    return hashlib.blake2b('\n'.join(file_states).encode()).hexdigest()[:12]
+
+
+def validate_trait(
+    fpath_inv_res: Path,
+    trait: str,
+    insitu_trait_df: pd.DataFrame,
+    fpath_insitu_bbch: Path,
+    fpaths_insitu: List[Path],
+    trait_setting: Dict[str, Any]
+) -> None:
+    """
+    Join inversion results and in-situ data of a single trait and
+    validate them. Runs in a worker process; the in-situ BBCH ratings are
+    therefore read from file instead of being passed from the parent
+    process.
+
+    :param fpath_inv_res:
+        path to the csv file with inversion results at the in-situ points
+    :param trait:
+        abbreviation of the trait to validate
+    :param insitu_trait_df:
+        in-situ measurements of the trait
+    :param fpath_insitu_bbch:
+        path to the in-situ BBCH ratings
+    :param fpaths_insitu:
+        paths to the in-situ trait files `insitu_trait_df` was read from.
+        Used to detect whether the joined data must be updated.
+    :param trait_setting:
+        keyword arguments passed to `validate_data` (name, unit, limits)
+    """
+    out_dir = fpath_inv_res.parent.joinpath(f'validation_{trait}')
+    out_dir.mkdir(exist_ok=True)
+    tag = input_tag([fpath_inv_res, fpath_insitu_bbch] + fpaths_insitu)
+    fpath_joined_res = out_dir.joinpath(f'joined_{trait}_{tag}.parquet')
+    # joined data under a fixed name as read by the figures_paper scripts
+    fpath_joined_csv = out_dir.joinpath(
+        f'inv_res_joined_with_insitu_{trait}.csv')
+
+    # join S2 and in-situ data or read data from existing file if the
+    # input files did not change since it was written
+    if fpath_joined_res.exists():
+        joined = pd.read_parquet(fpath_joined_res)
+        # restore the csv if it was removed since
+        if not fpath_joined_csv.exists():
+            joined.to_csv(fpath_joined_csv)
+    else:
+        inv_res_df = read_inv_res(fpath_inv_res, [trait])
+        if trait == 'cab':
+            inv_res_df = derive_cab(inv_res_df)
+        bbch_insitu = gpd.read_file(
+            fpath_insitu_bbch,
+            engine='pyogrio',
+            columns=BBCH_COLS,
+            read_geometry=False
+        )
+        joined = join_with_insitu(
+            insitu_trait_df, bbch_insitu, inv_res_df, [trait])
+        # remove outdated joined data (the csv is overwritten)
+        for fpath_outdated in out_dir.glob(f'joined_{trait}_*.parquet'):
+            fpath_outdated.unlink()
+        joined.to_parquet(fpath_joined_res)
+        joined.to_csv(fpath_joined_csv)
+
+    validate_data(
+        _df=joined,
+        out_dir=out_dir,
+        trait=trait,
+        **trait_setting
+    )
+
+
 if __name__ == '__main__':
 
     import os
@@ -171,26 +363,38 @@ if __name__ == '__main__':
 
     lai_list = []
     ccc_list = []
+    fpaths_insitu = []
     for year in years:
         trait_dir = Path(f'../data/in_situ_traits_{year}')
         # in-situ trait values
         fpath_insitu_lai = trait_dir.joinpath('in-situ_glai.gpkg')
         fpath_insitu_ccc = trait_dir.joinpath('in-situ_ccc.gpkg')
-        lai = gpd.read_file(fpath_insitu_lai)
+        fpaths_insitu.extend([fpath_insitu_lai, fpath_insitu_ccc])
+        lai = gpd.read_file(
+            fpath_insitu_lai,
+            engine='pyogrio',
+            columns=INSITU_COLS[year]['lai'],
+            read_geometry=False
+        )
         if year == 2019:
             lai['gdd_cumsum'] = 999
-            lai['point_id'] = lai.Plot.apply(
-                lambda x: '_'.join(str(x).split('_')[0:2]))
+            lai['point_id'] = lai.Plot.astype(str).str.extract(
+                PLOT_TO_POINT_ID, expand=False)
             lai['parcel'] = lai.field
             lai['genotype'] = 'Arnold'
             lai['location'] = 'SwissFutureFarm'
         lai_list.append(lai)
 
-        ccc = gpd.read_file(fpath_insitu_ccc)
+        ccc = gpd.read_file(
+            fpath_insitu_ccc,
+            engine='pyogrio',
+            columns=INSITU_COLS[year]['ccc'],
+            read_geometry=False
+        )
         if year == 2019:
             ccc['gdd_cumsum'] = 999
-            ccc['point_id'] = ccc.Plot.apply(
-                lambda x: '_'.join(str(x).split('_')[0:2]))
+            ccc['point_id'] = ccc.Plot.astype(str).str.extract(
+                PLOT_TO_POINT_ID, expand=False)
             ccc['parcel'] = ccc.field
             ccc['genotype'] = 'Arnold'
             ccc['location'] = 'SwissFutureFarm'
@@ -203,86 +407,68 @@ if __name__ == '__main__':
 
     fpath_insitu_bbch = Path(
         '../data/in_situ_traits_2022').joinpath('in-situ_bbch.gpkg')
-    bbch_insitu = gpd.read_file(fpath_insitu_bbch)
+
+    trait_settings = {
+        'lai': {
+            'trait_name': 'Green Leaf Area Index',
+            'trait_unit': r'$m^2$ $m^{-2}$',
+            'trait_limits': TraitLimits(0, 8)
+        },
+        'ccc': {
+            'trait_name': 'Canopy Chlorophyll Content',
+            'trait_unit': r'$g$ $m^{-2}$',
+            'trait_limits': TraitLimits(0, 4)
+        },
+        'cab': {
+            'trait_name': 'Leaf Chlorophyll Content',
+            'trait_unit': r'$\mu$ $g$ $cm^{-2}$',
+            'trait_limits': TraitLimits(0, 80)
+        }
+    }
+
+    # prepare the in-situ data once since it does not depend on the
+    # inversion results
+    insitu_trait_dfs = {}
+    for trait in traits:
+        if trait == 'cab':
+            # only take the ccc values from the ccc data so that
+            # the common columns (e.g., date, lai) do not collide
+            join_cols = ['point_id', 'gdd_cumsum', 'parcel', 'location']
+            insitu_trait_df = lai_all.merge(
+                ccc_all[join_cols + ['ccc']],
+                on=join_cols,
+                how='inner'
+            )
+            # calculate cab from lai and ccc
+            insitu_trait_df['cab'] = \
+                insitu_trait_df['ccc'].to_numpy() / \
+                insitu_trait_df['lai'].to_numpy() * 100  # [ug/cm2]
+        elif trait == 'lai':
+            insitu_trait_df = lai_all
+        elif trait == 'ccc':
+            insitu_trait_df = ccc_all
+        insitu_trait_dfs[trait] = insitu_trait_df
 
     # traits from inversion
     inv_res_dir = Path('../results/lut_based_inversion')
     sub_dirs = ['agdds_and_s2', 'agdds_only']
 
-    # validate traits
-    for sub_dir in sub_dirs:
-
-        fpath_inv_res = inv_res_dir.joinpath(sub_dir).joinpath(
-            'inv_res_gdd_insitu_points.csv')
-        inv_res_df = pd.read_csv(fpath_inv_res)
-
-        trait_settings = {
-            'lai': {
-                'trait_name': 'Green Leaf Area Index',
-                'trait_unit': r'$m^2$ $m^{-2}$',
-                'trait_limits': TraitLimits(0, 8),
-                'orig_trait_data': lai_all
-            },
-            'ccc': {
-                'trait_name': 'Canopy Chlorophyll Content',
-                'trait_unit': r'$g$ $m^{-2}$',
-                'trait_limits': TraitLimits(0, 4),
-                'orig_trait_data': ccc_all
-            },
-            'cab': {
-                'trait_name': 'Leaf Chlorophyll Content',
-                'trait_unit': r'$\mu$ $g$ $cm^{-2}$',
-                'trait_limits': TraitLimits(0, 80),
-                'orig_trait_data': [lai_all, ccc_all]}
-        }
-
-        for trait in traits:
-
-            out_dir = fpath_inv_res.parent.joinpath(f'validation_{trait}')
-            out_dir.mkdir(exist_ok=True)
-            # join in-situ and inversion data
-            if trait == 'cab':
-                insitu_trait_df = pd.merge(
-                    trait_settings[trait]['orig_trait_data'][0],
-                    trait_settings[trait]['orig_trait_data'][1],
-                    on=['point_id', 'gdd_cumsum', 'parcel', 'location']
-                )
-                # replace date_x with date and drop date_y
-                insitu_trait_df['date'] = insitu_trait_df['date_x']
-                insitu_trait_df.drop(
-                    columns=['date_x', 'date_y'], inplace=True)
-                # replace lai_x with lai and drop lai_y
-                insitu_trait_df['lai'] = insitu_trait_df['lai_x']
-                insitu_trait_df.drop(
-                    columns=['lai_x', 'lai_y'], inplace=True)
-
-                # calculate cab from lai and ccc
-                insitu_trait_df['cab'] = insitu_trait_df['ccc'] / \
-                    insitu_trait_df['lai'] * 100  # [ug/cm2]
-                # get all columns starting with 'lai' in inv_res_df
-                lai_cols = [
-                    col for col in inv_res_df.columns
-                    if col.startswith('lai')]
-                ccc_cols = [x.replace('lai', 'ccc') for x in lai_cols]
-                for idx, lai_col in enumerate(lai_cols):
-                    cab_col = lai_col.replace('lai', 'cab')
-                    inv_res_df[cab_col] = \
-                        inv_res_df[ccc_cols[idx]] / \
-                        inv_res_df[lai_col] * 100  # [ug/cm2]
-            else:
-                insitu_trait_df = trait_settings[trait]['orig_trait_data']
-            del trait_settings[trait]['orig_trait_data']
-            fpath_joined_res = out_dir.joinpath(
-                f'inv_res_joined_with_insitu_{trait}.csv')
-
-            # join S2 and in-situ data are read data from existing file
-            joined = join_with_insitu(
-                insitu_trait_df, bbch_insitu, inv_res_df, [trait])
-            joined.to_csv(fpath_joined_res)
-
-            validate_data(
-                _df=joined,
-                out_dir=out_dir,
+    # validate traits. The combinations of sub-directories and traits are
+    # independent from each other and are therefore run in parallel
+    with ProcessPoolExecutor() as executor:
+        futures = [
+            executor.submit(
+                validate_trait,
+                fpath_inv_res=inv_res_dir.joinpath(sub_dir).joinpath(
+                    'inv_res_gdd_insitu_points.csv'),
                 trait=trait,
-                **trait_settings[trait]
+                insitu_trait_df=insitu_trait_dfs[trait],
+                fpath_insitu_bbch=fpath_insitu_bbch,
+                fpaths_insitu=fpaths_insitu,
+                trait_setting=trait_settings[trait]
             )
+            for sub_dir in sub_dirs for trait in traits
+        ]
+        # raise exceptions from the worker processes (if any)
+        for future in futures:
+            future.result()